@@ -12,8 +12,8 @@ script_directory = Path(__file__).parent
 # Specify log file path in the same directory as the script
 log_file_path = script_directory / 'shader_cache_cleanup.log'
 
-# Configure logging with rotation
-handler = RotatingFileHandler(log_file_path, maxBytes=5 * 1024 * 1024, backupCount=5)
+# Configure logging with rotation; the log file is only opened on the first write
+handler = RotatingFileHandler(log_file_path, maxBytes=5 * 1024 * 1024, backupCount=5, delay=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -23,6 +23,35 @@ logging.basicConfig(
     ]
 )
 
+def appdata_directory(variable: str, default: Path) -> Path:
+    """Return the folder named by an environment variable, or the default if it is unset, empty or relative."""
+    value = os.environ.get(variable)
+    if value and Path(value).is_absolute():
+        return Path(value)
+    return default
+
+# Resolve the user profile folders once, honouring redirected AppData folders
+home_directory = Path.home()
+local_appdata = appdata_directory('LOCALAPPDATA', home_directory / 'AppData' / 'Local')
+local_low_appdata = local_appdata.parent / 'LocalLow'
+roaming_appdata = appdata_directory('APPDATA', home_directory / 'AppData' / 'Roaming')
+
+# Known shader cache locations, built once from the resolved profile folders
+shader_cache_directories = [
+    local_appdata / 'NVIDIA' / 'DXCache',
+    local_appdata / 'NVIDIA' / 'GLCache',
+    local_appdata / 'AMD' / 'DxCache',
+    local_appdata / 'UnrealEngine' / 'ShaderCache',
+    local_low_appdata / 'Unity' / 'Caches',
+    local_appdata / 'Temp' / 'NVIDIA Corporation' / 'NV_Cache',
+    local_appdata / 'Temp' / 'DXCache',
+    local_appdata / 'Temp' / 'D3DSCache',
+    local_appdata / 'Temp' / 'AMD' / 'GLCache',
+    roaming_appdata / 'Unreal Engine' / 'Common' / 'DerivedDataCache',
+    roaming_appdata / 'Unity' / 'Asset Store-5.x',
+    roaming_appdata / 'Microsoft' / 'CLR_v4.0',
+]
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Shader Cache Cleanup Tool")
@@ -43,17 +72,22 @@ def backup_files_in_directory(directory: Path):
 
 def remove_files_in_directory(directory: Path, dry_run: bool):
     """Remove all files and directories in the specified directory."""
-    if not directory.exists():
+    # DirEntry types come from the directory listing, so no stat per item
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except FileNotFoundError:
         logging.warning(f"Directory {directory} does not exist.")
         return
 
-    for item in directory.iterdir():
+    for entry in entries:
+        item = entry.path
         try:
-            if item.is_file() or item.is_symlink():
+            if entry.is_file() or entry.is_symlink():
                 if not dry_run:
-                    item.unlink()
+                    os.unlink(item)
                 logging.info(f"{'Would delete' if dry_run else 'Deleted'} file/symlink: {item}")
-            elif item.is_dir():
+            elif entry.is_dir():
                 if not dry_run:
                     shutil.rmtree(item)
                 logging.info(f"{'Would delete' if dry_run else 'Deleted'} directory: {item}")
@@ -65,27 +99,20 @@ def remove_files_in_directory(directory: Path, dry_run: bool):
             logging.error(f"Failed to delete {item}. Reason: {e}")
             logging.error(traceback.format_exc())
 
+def directory_has_entries(directory: Path) -> bool:
+    """Return True if the directory contains at least one entry, without listing all of it."""
+    try:
+        with os.scandir(directory) as entries:
+            return next(entries, None) is not None
+    except FileNotFoundError:
+        return False
+
 def remove_shader_cache(dry_run: bool, backup: bool):
     """Remove shader cache from known locations on Windows."""
-    shader_cache_directories = [
-        Path.home() / 'AppData' / 'Local' / 'NVIDIA' / 'DXCache',
-        Path.home() / 'AppData' / 'Local' / 'NVIDIA' / 'GLCache',
-        Path.home() / 'AppData' / 'Local' / 'AMD' / 'DxCache',
-        Path.home() / 'AppData' / 'Local' / 'UnrealEngine' / 'ShaderCache',
-        Path.home() / 'AppData' / 'LocalLow' / 'Unity' / 'Caches',
-        Path.home() / 'AppData' / 'Local' / 'Temp' / 'NVIDIA Corporation' / 'NV_Cache',
-        Path.home() / 'AppData' / 'Local' / 'Temp' / 'DXCache',
-        Path.home() / 'AppData' / 'Local' / 'Temp' / 'D3DSCache',
-        Path.home() / 'AppData' / 'Local' / 'Temp' / 'AMD' / 'GLCache',
-        Path.home() / 'AppData' / 'Roaming' / 'Unreal Engine' / 'Common' / 'DerivedDataCache',
-        Path.home() / 'AppData' / 'Roaming' / 'Unity' / 'Asset Store-5.x',
-        Path.home() / 'AppData' / 'Roaming' / 'Microsoft' / 'CLR_v4.0',
-    ]
-
     found_directories = []
 
     for directory in shader_cache_directories:
-        if directory.exists() and any(directory.iterdir()):
+        if directory.is_dir() and directory_has_entries(directory):
             found_directories.append(directory)
             logging.info(f"Found shader cache in directory: {directory}")
             
@@ -96,8 +123,9 @@ def remove_shader_cache(dry_run: bool, backup: bool):
             remove_files_in_directory(directory, dry_run)
 
             # Check for nested directories
-            for subdirectory in directory.rglob('*'):
-                if subdirectory.is_dir():  # Check if it's a directory
+            for root, subdirectories, _ in os.walk(directory):
+                for name in subdirectories:
+                    subdirectory = os.path.join(root, name)
                     if not dry_run:
                         shutil.rmtree(subdirectory)
                     logging.info(f"{'Would delete' if dry_run else 'Deleted'} subdirectory: {subdirectory}")